@@ -11,7 +11,7 @@ Requirements:
 - Mininet
 - FRRouting (FRR)
 - Open vSwitch
-- Python 3.6+
+- Python 3.9+
 """
 
 from mininet.net import Mininet
@@ -20,10 +20,47 @@ from mininet.cli import CLI
 from mininet.log import setLogLevel, info, error
 from mininet.link import TCLink
 import os
+import pwd
+import grp
+import io
+import ijson
+import orjson
 import time
+import hashlib
+import select
+import signal
+import shutil
 import subprocess
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# argv shared by zebra and bgpd; {d} is the router's frr_dir. The integrated
+# config is pushed once via vtysh -b rather than given to each daemon with -f
+_FRR_DAEMON_ARGV = ('/usr/lib/frr/{daemon}', '-d',
+                    '-i', '{d}/run/{daemon}.pid',
+                    '-z', '{d}/sockets/zserv.api',
+                    '--vty_socket', '{d}/sockets',
+                    '--pid_file', '{d}/run/{daemon}.pid',
+                    '--socket', '{d}/sockets/zserv.api',
+                    '--vty_addr', '127.0.0.1',
+                    '--vty_port', '0')
+
+# FRR daemons drop privileges to the frr user, which must own their config and state
+_FRR_UID = pwd.getpwnam('frr').pw_uid
+_FRR_GID = grp.getgrnam('frr').gr_gid
+
+
+def _write_frr_file(path, content, mode):
+    """Write content to path owned by frr:frr with the given mode, without any shell commands"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        os.fchown(fd, _FRR_UID, _FRR_GID)
+        os.fchmod(fd, mode)
+        os.write(fd, content.encode())
+    finally:
+        os.close(fd)
+
 class BGPRouter(Host):
     """Custom host class to configure FRR BGP routers"""
     
@@ -32,6 +69,11 @@ class BGPRouter(Host):
         self.bgp_asn = params.pop('asn')  # Store ASN before parent init
         self.bgp_router_id = params.pop('router_id')  # Store router_id before parent init
         self.frr_dir = f'/tmp/frr-{name}'  # Use /tmp/frr-{name} for per-router isolation
+        self.zebra_pidfd = None  # pidfds for the running daemons, opened in _verify_frr_status
+        self.bgpd_pidfd = None
+        self._frr_conf_hash = None  # digest of the frr.conf the running daemons were started with
+        # Let Mininet bind-mount frr_dir over /etc/frr inside the router's namespace
+        params['privateDirs'] = params.get('privateDirs', []) + [('/etc/frr', self.frr_dir)]
         info(f'*** Initializing BGP Router {name} with ASN {self.bgp_asn} and router ID {self.bgp_router_id}\n')
         print(f'[DEBUG][__init__] {name}: ASN={self.bgp_asn}, router_id={self.bgp_router_id}')
         super(BGPRouter, self).__init__(name, **params)
@@ -40,38 +82,43 @@ class BGPRouter(Host):
         print(f'[DEBUG][config] {self.name}: ASN={self.bgp_asn}, router_id={self.bgp_router_id}')
         super(BGPRouter, self).config(**params)
         info(f'*** Configuring BGP Router {self.name} with ASN {self.bgp_asn} and router ID {self.bgp_router_id}\n')
-        # Enable IPv4 forwarding
-        self.cmd('sysctl -w net.ipv4.ip_forward=1')
-        # Disable reverse path filtering
-        self.cmd('sysctl -w net.ipv4.conf.all.rp_filter=0')
-        self.cmd('sysctl -w net.ipv4.conf.default.rp_filter=0')
-        # Enable loose mode for reverse path filtering
-        for intf in self.intfList():
-            self.cmd(f'sysctl -w net.ipv4.conf.{intf.name}.rp_filter=0')
-        
-    def setup_frr(self, peers=None):
-        """Configure FRR with BGP settings"""
+        # Enable IPv4 forwarding and disable reverse path filtering (globally, by
+        # default and on every interface) in a single shell round trip
+        self._cmd_quiet('; '.join(['sysctl -w net.ipv4.ip_forward=1',
+                                   'sysctl -w net.ipv4.conf.all.rp_filter=0',
+                                   'sysctl -w net.ipv4.conf.default.rp_filter=0'] +
+                                  [f'sysctl -w net.ipv4.conf.{intf.name}.rp_filter=0' for intf in self.intfList()]))
+        
+    def setup_frr(self, peers=None, clear_sessions=False):
+        """Configure FRR with BGP settings; clear_sessions resets BGP if nothing else needs redoing"""
         print(f'[DEBUG][setup_frr-start] {self.name}: ASN={self.bgp_asn}, router_id={self.bgp_router_id}, peers={peers}')
         info(f'*** Setting up FRR for {self.name} with ASN {self.bgp_asn} and router ID {self.bgp_router_id}\n')
         
-        # 如果你不想每次手动加 chmod
-        self.cmd(f'chown -R frr:frr {self.frr_dir}')
-        self.cmd(f'chmod -R go+rX {self.frr_dir}')  # 允许其他用户读取
-        
-        # Stop any existing FRR processes for this router
-        self.cmd(f'pkill -f "zebra.*{self.name}"')
-        self.cmd(f'pkill -f "bgpd.*{self.name}"')
-        time.sleep(2)
+        # Generate integrated FRR config
+        print(f'[DEBUG][setup_frr-preconf] {self.name}: ASN={self.bgp_asn}, router_id={self.bgp_router_id}, peers={peers}')
+        frr_conf = self._compose_frr_conf(peers)
+        conf_hash = hashlib.blake2b(frr_conf.encode(), digest_size=16).digest()
+        
+        # Same config and daemons still up: skip the rewrite/restart. Only the recovery
+        # path (after a link flap) asks for the BGP sessions to be reset as well
+        if conf_hash == self._frr_conf_hash and self._daemon_alive('zebra') and self._daemon_alive('bgpd'):
+            if clear_sessions:
+                info(f'*** FRR config unchanged for {self.name}, clearing BGP sessions\n')
+                self._cmd_quiet(f'vtysh --config_dir {self.frr_dir} --vty_socket {self.frr_dir}/sockets -c "clear ip bgp *"')
+            return
         
-        # Clean and create FRR directory
-        self.cmd(f'rm -rf {self.frr_dir}')
-        self.cmd(f'mkdir -p {self.frr_dir}')
-        self.cmd(f'chown frr:frr {self.frr_dir}')
+        # Stop any existing FRR processes for this router via their pid files,
+        # returning as soon as they have exited rather than after a fixed sleep
+        self.stop_daemons()
         
-        # Create required subdirectories
+        # frr_dir itself is the router's /etc/frr privateDir, created by Mininet;
+        # reset its run/log/sockets state in-process instead of via rm/mkdir/chown
+        os.chown(self.frr_dir, _FRR_UID, _FRR_GID)
         for subdir in ['run', 'log', 'sockets']:
-            self.cmd(f'mkdir -p {self.frr_dir}/{subdir}')
-            self.cmd(f'chown frr:frr {self.frr_dir}/{subdir}')
+            path = f'{self.frr_dir}/{subdir}'
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path)
+            os.chown(path, _FRR_UID, _FRR_GID)
         
         # Generate daemons config
         daemons_conf = """zebra=yes
@@ -94,9 +141,7 @@ vrrpd=no
 pathd=no"""
 
         # Write daemons config
-        with open(f'{self.frr_dir}/daemons', 'w') as f:
-            f.write(daemons_conf)
-        self.cmd(f'chmod 640 {self.frr_dir}/daemons')
+        _write_frr_file(f'{self.frr_dir}/daemons', daemons_conf, 0o640)
         
         # Generate vtysh config
         vtysh_conf = f"""hostname {self.name}
@@ -108,71 +153,11 @@ log file {self.frr_dir}/log/frr.log informational
 """
         
         # Write vtysh config
-        with open(f'{self.frr_dir}/vtysh.conf', 'w') as f:
-            f.write(vtysh_conf)
-        self.cmd(f'chmod 644 {self.frr_dir}/vtysh.conf')
-        
-        # Generate integrated FRR config
-        print(f'[DEBUG][setup_frr-preconf] {self.name}: ASN={self.bgp_asn}, router_id={self.bgp_router_id}, peers={peers}')
-        frr_conf = f"""frr version 7.2.1
-frr defaults traditional
-!
-hostname {self.name}
-!
-service integrated-vtysh-config
-!
-log timestamp precision 6
-log file {self.frr_dir}/log/frr.log debugging
-!
-interface {self.name}-eth0
- description Connection to Switch
- ip address {self.IP()}/24
- no shutdown
-!
-interface {self.name}-peer
- description BGP Peering Link
- ip address {self.params['ip']}/24
- no shutdown
-!
-router bgp {self.bgp_asn}
- bgp router-id {self.bgp_router_id}
- bgp graceful-restart
- no bgp ebgp-requires-policy
- no bgp default ipv4-unicast
- no bgp network import-check
- bgp bestpath as-path multipath-relax
- timers bgp 3 9
-"""
-        if peers:
-            for peer in peers:
-                frr_conf += f" neighbor {peer['ip']} remote-as {peer['asn']}\n"
-                frr_conf += f" neighbor {peer['ip']} description Peer with {peer['asn']}\n"
-                frr_conf += f" neighbor {peer['ip']} timers 3 9\n"
-                frr_conf += f" neighbor {peer['ip']} timers connect 5\n"
-        
-        frr_conf += "!\n address-family ipv4 unicast\n"
-        frr_conf += f" network {self.IP()}/24\n"
-        if peers:
-            for peer in peers:
-                frr_conf += f" neighbor {peer['ip']} activate\n"
-                frr_conf += f" neighbor {peer['ip']} next-hop-self\n"
-                frr_conf += f" neighbor {peer['ip']} soft-reconfiguration inbound\n"
-        frr_conf += " maximum-paths 64\n"
-        frr_conf += " redistribute connected\n"
-        frr_conf += " exit-address-family\n!\n"
-        
-        # Add line vty config
-        frr_conf += """!
-line vty
-!"""
+        _write_frr_file(f'{self.frr_dir}/vtysh.conf', vtysh_conf, 0o644)
         
         # Write FRR config
-        with open(f'{self.frr_dir}/frr.conf', 'w') as f:
-            f.write(frr_conf)
-        
-        # Set permissions
-        self.cmd(f'chown -R frr:frr {self.frr_dir}')
-        self.cmd(f'chmod 640 {self.frr_dir}/frr.conf')
+        _write_frr_file(f'{self.frr_dir}/frr.conf', frr_conf, 0o640)
+        self._frr_conf_hash = conf_hash
         
         # Create a custom vtysh.conf for this router
         vtysh_conf = f"""hostname {self.name}
@@ -182,40 +167,12 @@ service integrated-vtysh-config
 !
 log file {self.frr_dir}/log/frr.log informational
 """
-        with open(f'/etc/frr/vtysh-{self.name}.conf', 'w') as f:
-            f.write(vtysh_conf)
-        self.cmd(f'chmod 644 /etc/frr/vtysh-{self.name}.conf')
+        _write_frr_file(f'/etc/frr/vtysh-{self.name}.conf', vtysh_conf, 0o644)
         
         # Start FRR daemons with namespace-aware configuration
         info(f'*** Starting FRR daemons for {self.name}\n')
         
-        # Start Zebra with custom config
-        zebra_cmd = f'/usr/lib/frr/zebra -d ' \
-                    f'-f {self.frr_dir}/frr.conf ' \
-                    f'-i {self.frr_dir}/run/zebra.pid ' \
-                    f'-z {self.frr_dir}/sockets/zserv.api ' \
-                    f'--vty_socket {self.frr_dir}/sockets ' \
-                    f'--config_file {self.frr_dir}/frr.conf ' \
-                    f'--pid_file {self.frr_dir}/run/zebra.pid ' \
-                    f'--socket {self.frr_dir}/sockets/zserv.api ' \
-                    f'--vty_addr 127.0.0.1 ' \
-                    f'--vty_port 0'
-        self.zebra = self.popen(zebra_cmd, shell=True)
-        time.sleep(3)
-        
-        # Start BGPd with custom config
-        bgpd_cmd = f'/usr/lib/frr/bgpd -d ' \
-                   f'-f {self.frr_dir}/frr.conf ' \
-                   f'-i {self.frr_dir}/run/bgpd.pid ' \
-                   f'-z {self.frr_dir}/sockets/zserv.api ' \
-                   f'--vty_socket {self.frr_dir}/sockets ' \
-                   f'--config_file {self.frr_dir}/frr.conf ' \
-                   f'--pid_file {self.frr_dir}/run/bgpd.pid ' \
-                   f'--socket {self.frr_dir}/sockets/zserv.api ' \
-                   f'--vty_addr 127.0.0.1 ' \
-                   f'--vty_port 0'
-        self.bgpd = self.popen(bgpd_cmd, shell=True)
-        time.sleep(2)
+        self.start_daemons()
         
         # Verify configuration and BGP status
         info(f'*** Verifying FRR configuration for {self.name}\n')
@@ -238,39 +195,216 @@ log file {self.frr_dir}/log/frr.log informational
         except Exception as e:
             error(f'*** Failed to write PID file for {self.name}: {str(e)}\n')
             
+    def _daemon_argv(self, daemon):
+        """Expand _FRR_DAEMON_ARGV for one daemon of this router"""
+        return [a.format(d=self.frr_dir, daemon=daemon) for a in _FRR_DAEMON_ARGV]
+
+    def start_daemons(self):
+        """Start zebra then bgpd, wait until each is ready, and load frr.conf into both"""
+        self.zebra = self.popen(self._daemon_argv('zebra'))
+        # With -d the launcher exits as soon as the daemon has detached
+        self._wait_daemonized(self.zebra, 'zebra')
+        # zserv.api only appears once zebra is listening
+        self._wait_for(f'{self.frr_dir}/run/zebra.pid')
+        self._wait_for(f'{self.frr_dir}/sockets/zserv.api')
+        
+        self.bgpd = self.popen(self._daemon_argv('bgpd'))
+        self._wait_daemonized(self.bgpd, 'bgpd')
+        self._wait_for(f'{self.frr_dir}/run/bgpd.pid')
+        self._wait_for(f'{self.frr_dir}/sockets/bgpd.vty')
+        
+        # Apply the integrated frr.conf to all daemons in a single vtysh pass,
+        # instead of every daemon parsing the whole file itself via -f
+        self._cmd_quiet(f'vtysh --config_dir {self.frr_dir} --vty_socket {self.frr_dir}/sockets -b')
+        # Refresh the cached pidfds so stop_daemons targets these processes
+        self._open_pidfd('zebra')
+        self._open_pidfd('bgpd')
+
+    def _compose_frr_conf(self, peers=None):
+        """Generate the integrated FRR config for this router"""
+        own_ip = self.IP()
+        peer_ip = self.params['ip']
+        header = f"""frr version 7.2.1
+frr defaults traditional
+!
+hostname {self.name}
+!
+service integrated-vtysh-config
+!
+log timestamp precision 6
+log file {self.frr_dir}/log/frr.log debugging
+!
+interface {self.name}-eth0
+ description Connection to Switch
+ ip address {own_ip}/24
+ no shutdown
+!
+interface {self.name}-peer
+ description BGP Peering Link
+ ip address {peer_ip}/24
+ no shutdown
+!
+router bgp {self.bgp_asn}
+ bgp router-id {self.bgp_router_id}
+ bgp graceful-restart
+ no bgp ebgp-requires-policy
+ no bgp default ipv4-unicast
+ no bgp network import-check
+ bgp bestpath as-path multipath-relax
+ timers bgp 3 9
+"""
+        peers = peers or []
+        peer_lines = [f" neighbor {p['ip']} remote-as {p['asn']}\n"
+                      f" neighbor {p['ip']} description Peer with {p['asn']}\n"
+                      f" neighbor {p['ip']} timers 3 9\n"
+                      f" neighbor {p['ip']} timers connect 5\n" for p in peers]
+        afi_lines = [f" neighbor {p['ip']} activate\n"
+                     f" neighbor {p['ip']} next-hop-self\n"
+                     f" neighbor {p['ip']} soft-reconfiguration inbound\n" for p in peers]
+        afi_header = f"!\n address-family ipv4 unicast\n network {own_ip}/24\n"
+        footer = """ maximum-paths 64
+ redistribute connected
+ exit-address-family
+!
+!
+line vty
+!"""
+        return ''.join([header, *peer_lines, afi_header, *afi_lines, footer])
+
+    def _cmd_quiet(self, cmd):
+        """Run cmd in the router shell, discarding its output so waitOutput only has to find the prompt"""
+        return self.cmd(f'{{ {cmd}; }} > /dev/null 2>&1')
+
+    def _wait_daemonized(self, proc, daemon, timeout=5.0):
+        """Block until the daemon launcher exits, i.e. the daemon has forked and detached"""
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            error(f'*** {daemon} launcher for {self.name} did not exit within {timeout}s\n')
+
+    def _wait_for(self, path, timeout=5.0):
+        """Poll until path exists, backing off from 1ms up to 50ms between checks"""
+        deadline = time.time() + timeout
+        i = 0
+        while not os.path.exists(path):
+            if time.time() > deadline:
+                error(f'*** Timed out waiting for {path} on {self.name}\n')
+                return False
+            time.sleep(min(0.001 * 2 ** i, 0.05))
+            i += 1
+        return True
+
+    def bgp_established(self):
+        """Return True once every configured BGP peer is in Established state"""
+        output = self.cmd(
+            'vtysh --config_dir {} --vty_socket {} -c "show bgp summary json"'
+            .format(self.frr_dir, self.frr_dir+'/sockets')
+        )
+        try:
+            peers = orjson.loads(output[output.find('{'):])['ipv4Unicast']['peers']
+        except (orjson.JSONDecodeError, KeyError):
+            return False
+        return bool(peers) and all(p.get('state') == 'Established' for p in peers.values())
+
+    def _open_pidfd(self, daemon):
+        """Open a pidfd for daemon from its pid file and cache it as self.<daemon>_pidfd"""
+        old_fd = getattr(self, f'{daemon}_pidfd')
+        if old_fd is not None:
+            os.close(old_fd)
+        fd = None
+        try:
+            with open(f'{self.frr_dir}/run/{daemon}.pid') as f:
+                pid = int(f.read())
+            fd = os.pidfd_open(pid)
+            # frr_dir outlives the run and SIGKILLed daemons leave their pid files behind,
+            # so the pid may have been reused: only accept this router's own daemon. The
+            # pidfd is already open, so the process can't be swapped after this check.
+            if not self._is_own_daemon(pid, daemon):
+                os.close(fd)
+                fd = None
+        except (OSError, ValueError):
+            pass
+        setattr(self, f'{daemon}_pidfd', fd)
+        return fd
+
+    def _is_own_daemon(self, pid, daemon):
+        """True if pid runs this router's daemon, i.e. its argv names our pid file"""
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                argv = f.read().decode(errors='replace').split('\0')
+        except OSError:
+            return False
+        return (os.path.basename(argv[0]) == daemon
+                and f'{self.frr_dir}/run/{daemon}.pid' in argv)
+
+    def _daemon_alive(self, daemon):
+        """A pidfd becomes readable once its process exits"""
+        fd = getattr(self, f'{daemon}_pidfd')
+        return fd is not None and not select.select([fd], [], [], 0)[0]
+
+    def stop_daemons(self, sig=signal.SIGTERM, timeout=2.0):
+        """Signal zebra and bgpd through their pidfds and wait for them to exit"""
+        for daemon in ('zebra', 'bgpd'):
+            fd = getattr(self, f'{daemon}_pidfd')
+            if fd is None:
+                # Daemons not started through setup_frr (e.g. startfrr): fall back to the pid file
+                fd = self._open_pidfd(daemon)
+            if fd is None:
+                continue
+            try:
+                os.pidfd_send_signal(fd, sig)
+            except ProcessLookupError:
+                exited = True
+            else:
+                # The daemons are not our children, so wait on the pidfd rather than waitpid()
+                exited = bool(select.select([fd], [], [], timeout)[0])
+            os.close(fd)
+            setattr(self, f'{daemon}_pidfd', None)
+            if exited:
+                # SIGKILL gives the daemon no chance to remove its pid file itself
+                try:
+                    os.unlink(f'{self.frr_dir}/run/{daemon}.pid')
+                except FileNotFoundError:
+                    pass
+
+    def probe_peer(self, ip):
+        """Check that a BGP peer is reachable with a single ping"""
+        # A TCP connect to port 179 from our own (configured neighbor) address would look like
+        # an extra session attempt to the peer's bgpd and can trip its collision handling.
+        # pexec goes through mnexec rather than the router's shell, so probes can overlap
+        _, _, rc = self.pexec(['ping', '-c1', '-W1', ip])
+        if rc != 0:
+            error(f'*** Warning: BGP peer {ip} unreachable from {self.name}\n')
+            return False
+        return True
+
     def _verify_frr_status(self):
         """Verify FRR daemon status and configuration"""
-        # Check if processes are running
-        zebra_pid = self.cmd(f'cat {self.frr_dir}/run/zebra.pid').strip()
-        bgpd_pid = self.cmd(f'cat {self.frr_dir}/run/bgpd.pid').strip()
+        # Check if processes are running; pidfds stay valid even if the pid is later reused
+        zebra_fd = self._open_pidfd('zebra')
+        bgpd_fd = self._open_pidfd('bgpd')
         
-        if not zebra_pid or not bgpd_pid:
+        if zebra_fd is None or bgpd_fd is None:
             error(f'*** Error: FRR processes not running for {self.name}\n')
             return False
         
         # Verify process existence
-        if not os.path.exists(f'/proc/{zebra_pid}') or not os.path.exists(f'/proc/{bgpd_pid}'):
+        if not self._daemon_alive('zebra') or not self._daemon_alive('bgpd'):
             error(f'*** Error: FRR processes died for {self.name}\n')
             return False
         
-        # Check BGP configuration using custom vtysh command
+        # Check BGP configuration and status with one vtysh process
         info(f'*** BGP Configuration for {self.name}:\n')
         vtysh_cmd = f'VTYSH_PAGER=cat vtysh ' \
                     f'--config_dir {self.frr_dir} ' \
                     f'--vty_socket {self.frr_dir}/sockets ' \
-                    f'-c "show running-config"'
-        self.cmd(vtysh_cmd)
-        
-        # Check BGP status
-        vtysh_cmd = f'VTYSH_PAGER=cat vtysh ' \
-                    f'--config_dir {self.frr_dir} ' \
-                    f'--vty_socket {self.frr_dir}/sockets ' \
+                    f'-c "show running-config" ' \
                     f'-c "show ip bgp summary"'
-        self.cmd(vtysh_cmd)
+        info(self.cmd(vtysh_cmd))
         
         # Check routing table
         info(f'*** Routing table for {self.name}:\n')
-        self.cmd('ip route')
+        info(self.cmd('ip route'))
         
         return True
     
@@ -281,24 +415,22 @@ log file {self.frr_dir}/log/frr.log informational
             'vtysh --config_dir {} --vty_socket {} -c "show ip bgp json"'
             .format(self.frr_dir, self.frr_dir+'/sockets')
         )
-    
-    # 解析JSON获取有效路由
-    try:
-        routes = json.loads(bgp_routes)['routes']
-        for prefix, attrs in routes.items():
-            if attrs[0]['valid'] and attrs[0]['best']:
-                nh = attrs[0]['nexthops'][0]['ip']
-                # 安装高AD静态路由（AD=250，高于BGP的200）
-                self.cmd(
-                    'vtysh --config_dir {} --vty_socket {} -c "'
-                    'configure terminal\n'
-                    'ip route {} {} 250 tag 666\n'
-                    'exit"'
-                    .format(self.frr_dir, self.frr_dir+'/sockets', prefix, nh)
-                )
-                info(f'*** Installed fail-static: {prefix} via {nh}\n')
-    except Exception as e:
-        error(f'*** Failed to install fail-static: {str(e)}\n')
+        
+        # 解析JSON获取有效路由; stream one prefix at a time instead of decoding the whole RIB
+        try:
+            doc = io.BytesIO(bgp_routes[bgp_routes.find('{'):].encode())
+            for prefix, attrs in ijson.kvitems(doc, 'routes'):
+                if attrs[0]['valid'] and attrs[0]['best']:
+                    nh = attrs[0]['nexthops'][0]['ip']
+                    # 安装高AD静态路由（AD=250，高于BGP的200）
+                    self._cmd_quiet(
+                        'vtysh --config_dir {} --vty_socket {} '
+                        '-c "configure terminal" -c "ip route {} {} 250 tag 666"'
+                        .format(self.frr_dir, self.frr_dir+'/sockets', prefix, nh)
+                    )
+                    info(f'*** Installed fail-static: {prefix} via {nh}\n')
+        except (ijson.JSONError, KeyError, IndexError) as e:
+            error(f'*** Failed to install fail-static: {str(e)}\n')
 
 class SDNBGPExperiment:
     """Main class to set up and run the BGP experiment"""
@@ -409,79 +541,61 @@ class SDNBGPExperiment:
             switch.cmd('ovs-ofctl -O OpenFlow13 del-flows {}'.format(switch.name))
 
             # ARP packets: flood
-            switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0806,actions=FLOOD"'.format(switch.name))
+            flows = ['table=0,priority=100,dl_type=0x0806,actions=FLOOD']
 
             # ICMP packets: forward based on destination
             if switch.name == 's1':
                 # s1: forward to h1 or bgp1 based on destination
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.1.2,actions=output:1"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.1.1,actions=output:2"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=50,dl_type=0x0800,actions=output:2"'.format(switch.name))
+                flows += ['table=0,priority=100,dl_type=0x0800,nw_dst=10.0.1.2,actions=output:1',
+                          'table=0,priority=100,dl_type=0x0800,nw_dst=10.0.1.1,actions=output:2',
+                          'table=0,priority=50,dl_type=0x0800,actions=output:2']
             elif switch.name == 's2':
                 # s2: forward to h2 or bgp2 based on destination
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.2.2,actions=output:1"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.2.1,actions=output:2"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=50,dl_type=0x0800,actions=output:2"'.format(switch.name))
+                flows += ['table=0,priority=100,dl_type=0x0800,nw_dst=10.0.2.2,actions=output:1',
+                          'table=0,priority=100,dl_type=0x0800,nw_dst=10.0.2.1,actions=output:2',
+                          'table=0,priority=50,dl_type=0x0800,actions=output:2']
             elif switch.name == 's3':
                 # s3: forward to h3 or bgp3 based on destination
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.3.2,actions=output:1"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.3.1,actions=output:2"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=50,dl_type=0x0800,actions=output:2"'.format(switch.name))
+                flows += ['table=0,priority=100,dl_type=0x0800,nw_dst=10.0.3.2,actions=output:1',
+                          'table=0,priority=100,dl_type=0x0800,nw_dst=10.0.3.1,actions=output:2',
+                          'table=0,priority=50,dl_type=0x0800,actions=output:2']
+
+            # Install all rules in one atomic bundle over a single OpenFlow connection
+            switch.cmd('printf "%s\\n" {} | ovs-ofctl -O OpenFlow13 --bundle add-flows {} -'.format(
+                ' '.join(f'"{flow}"' for flow in flows), switch.name))
 
         # Configure BGP routers
         info('*** Configuring BGP routers\n')
-        # Configure BGP for router 1 (AS 65001)
-        bgp1.setup_frr(
-            peers=[{
-                'ip': '10.0.12.2',
-                'asn': 65002
-            }]
-        )
-
-        # Configure BGP for router 2 (AS 65002)
-        bgp2.setup_frr(
-            peers=[
-                {'ip': '10.0.12.1', 'asn': 65001},
-                {'ip': '10.0.23.2', 'asn': 65003}
-            ]
-        )
-
-        # Configure BGP for router 3 (AS 65003)
-        bgp3.setup_frr(
-            peers=[{
-                'ip': '10.0.23.1',
-                'asn': 65002
-            }]
-        )
-
+        # Configure BGP for each router using the peers_map; routers are independent
+        # (own namespace, own /tmp dir), so bring them up concurrently
+        with ThreadPoolExecutor(max_workers=len(self.peers_map)) as ex:
+            list(ex.map(lambda kv: self.net.get(kv[0]).setup_frr(peers=kv[1]), self.peers_map.items()))
 
         # Verify connectivity between BGP routers
         info('*** Verifying BGP router connectivity\n')
-        bgp1.cmd('ping -c 1 10.0.12.2')
-        bgp2.cmd('ping -c 1 10.0.12.1')
-        bgp2.cmd('ping -c 1 10.0.23.2')
-        bgp3.cmd('ping -c 1 10.0.23.1')
+        # Ping each peer from inside the router's namespace, concurrently
+        probes = [(bgp1, '10.0.12.2'), (bgp2, '10.0.12.1'), (bgp2, '10.0.23.2'), (bgp3, '10.0.23.1')]
+        with ThreadPoolExecutor(max_workers=len(probes)) as ex:
+            list(ex.map(lambda rp: rp[0].probe_peer(rp[1]), probes))
 
         self.net.experiment = self  # Attach the experiment instance to the Mininet object
         
     def configure_bgp(self):
-        """Configure BGP on the routers"""
-        # Configure BGP for each router using the peers_map
-        for router, peers in self.peers_map.items():
-            self.net.get(router).setup_frr(peers=peers)
-
+        """Wait for the BGP sessions set up in setup_topology and verify them"""
         # Wait for BGP to establish
         info('*** Waiting for BGP to establish\n')
-        time.sleep(10)
+        self.wait_for_bgp()
 
         # Verify BGP status
         info('*** Verifying BGP status\n')
         for router in self.peers_map:
             info(f'*** {router} BGP status:\n')
-            r = self.net.get(router)
-            r.cmd('vtysh -c "show ip bgp summary"')
-            r.cmd('vtysh -c "show ip route"')
-            r.cmd('vtysh -c "show ip bgp neighbors"')
+            # One vtysh process per router runs all three show commands
+            self.net.get(router).cmd(
+                'VTYSH_PAGER=cat vtysh --config_dir {} --vty_socket {} '
+                '-c "show ip bgp summary json" -c "show ip bgp neighbors json" -c "show ip route json"'
+                .format(f'/tmp/frr-{router}', f'/tmp/frr-{router}/sockets')
+            )
 
         # Verify connectivity
         info('*** Verifying connectivity\n')
@@ -492,6 +606,20 @@ class SDNBGPExperiment:
         # Snapshot dynamic routes for fail-static
         self.snapshot_routes()
 
+    def wait_for_bgp(self, timeout=30.0):
+        """Poll BGP summaries until all sessions are Established or timeout expires"""
+        deadline = time.time() + timeout
+        pending = list(self.peers_map)
+        while pending:
+            pending = [r for r in pending if not self.net.get(r).bgp_established()]
+            if not pending:
+                break
+            if time.time() > deadline:
+                error(f'*** Warning: BGP not established on {", ".join(pending)}\n')
+                return False
+            time.sleep(0.2)
+        return True
+
     def snapshot_routes(self):
         """增强版路由快照，记录BGP路径属性"""
         self.last_dynamic_routes = {}
@@ -502,7 +630,9 @@ class SDNBGPExperiment:
                 .format(f'/tmp/frr-{router}', f'/tmp/frr-{router}/sockets')
             )
             try:
-                routes = json.loads(output)['routes']
+                # Skip any vtysh banner noise before the JSON document
+                idx = output.find('{')
+                routes = orjson.loads(output[idx:])['routes']
                 self.last_dynamic_routes[router] = [
                     {
                         'prefix': p, 
@@ -510,8 +640,8 @@ class SDNBGPExperiment:
                         'as_path': a[0]['path']
                     } for p, a in routes.items() if a[0]['valid'] and a[0]['best']
                 ]
-            except:
-                error(f'*** Failed to snapshot routes for {router}\n')
+            except (ValueError, KeyError, IndexError, TypeError) as e:  # JSONDecodeError is a ValueError
+                error(f'*** Failed to snapshot routes for {router}: {e}\n')
         
     def start_experiment(self):
         """Start the experiment environment"""
@@ -547,7 +677,7 @@ class SDNBGPExperiment:
             info('*** Stopping FRR daemons\n')
             for router in ['bgp1', 'bgp2', 'bgp3']:
                 if router in self.net:
-                    self.net.get(router).cmd('killall -9 watchfrr zebra bgpd || true')
+                    self.net.get(router).stop_daemons(signal.SIGKILL)
             info('*** Stopping network\n')
             self.net.stop()
 
@@ -561,7 +691,7 @@ class SDNBGPExperiment:
             for route in self.last_dynamic_routes.get(router, []):
                 r.cmd(f'ip route add {route["prefix"]} via {route["nexthop"]} proto zebra')
             # 3. 重建BGP会话
-            r.setup_frr(peers=self.peers_map[router])
+            r.setup_frr(peers=self.peers_map[router], clear_sessions=True)
 
 class CustomCLI(CLI):
     def do_recoverbgp(self, line):
@@ -592,25 +722,24 @@ class CustomCLI(CLI):
         Start zebra and bgpd daemons for bgp1, bgp2, and bgp3 with correct config and socket paths.
         Usage: startfrr
         """
-        for router in ['bgp1', 'bgp2', 'bgp3']:
+        async def start(router):
             try:
                 r = self.mn.get(router)
                 print(f"*** Starting zebra and bgpd for {router}")
                 frr_dir = f"/tmp/frr-{router}"
                 # Clean up old run/sockets files
-                r.cmd(f'rm -rf {frr_dir}/run/*')
-                r.cmd(f'rm -rf {frr_dir}/sockets/*')
-                # Start zebra
-                zebra_cmd = f'/usr/lib/frr/zebra -d -f {frr_dir}/frr.conf -i {frr_dir}/run/zebra.pid -z {frr_dir}/sockets/zserv.api --vty_socket {frr_dir}/sockets --config_file {frr_dir}/frr.conf --pid_file {frr_dir}/run/zebra.pid --socket {frr_dir}/sockets/zserv.api --vty_addr 127.0.0.1 --vty_port 0'
-                r.cmd(zebra_cmd)
-                time.sleep(2)
-                # Start bgpd
-                bgpd_cmd = f'/usr/lib/frr/bgpd -d -f {frr_dir}/frr.conf -i {frr_dir}/run/bgpd.pid -z {frr_dir}/sockets/zserv.api --vty_socket {frr_dir}/sockets --config_file {frr_dir}/frr.conf --pid_file {frr_dir}/run/bgpd.pid --socket {frr_dir}/sockets/zserv.api --vty_addr 127.0.0.1 --vty_port 0'
-                r.cmd(bgpd_cmd)
+                await asyncio.to_thread(r.cmd, f'rm -rf {frr_dir}/run/* {frr_dir}/sockets/*')
+                await asyncio.to_thread(r.start_daemons)
                 print(f"*** FRR daemons started for {router}")
             except Exception as e:
                 print(f"*** Error starting FRR daemons for {router}: {e}")
 
+        async def start_all():
+            # Routers are independent, so start them all at once instead of one after another
+            await asyncio.gather(*(start(router) for router in ['bgp1', 'bgp2', 'bgp3']))
+
+        asyncio.run(start_all())
+
 def main():
     """Main function to run the experiment"""
     setLogLevel('info')
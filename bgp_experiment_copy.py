@@ -17,60 +17,29 @@ Requirements:
 from mininet.net import Mininet
 from mininet.node import Controller, RemoteController, OVSSwitch, Host
 from mininet.cli import CLI
-from mininet.log import setLogLevel, info, error
+from mininet.log import setLogLevel, info, error, debug
 from mininet.link import TCLink
 import os
+import re
+import sys
+import pwd
+import grp
+import json
 import time
+import shutil
+import signal
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-class BGPRouter(Host):
-    """Custom host class to configure FRR BGP routers"""
-    
-    def __init__(self, name, **params):
-        """Initialize the BGP router with ASN"""
-        self.bgp_asn = params.pop('asn')  # Store ASN before parent init
-        self.bgp_router_id = params.pop('router_id')  # Store router_id before parent init
-        self.frr_dir = f'/tmp/frr-{name}'  # Use /tmp/frr-{name} for per-router isolation
-        info(f'*** Initializing BGP Router {name} with ASN {self.bgp_asn} and router ID {self.bgp_router_id}\n')
-        print(f'[DEBUG][__init__] {name}: ASN={self.bgp_asn}, router_id={self.bgp_router_id}')
-        super(BGPRouter, self).__init__(name, **params)
-    
-    def config(self, **params):
-        print(f'[DEBUG][config] {self.name}: ASN={self.bgp_asn}, router_id={self.bgp_router_id}')
-        super(BGPRouter, self).config(**params)
-        info(f'*** Configuring BGP Router {self.name} with ASN {self.bgp_asn} and router ID {self.bgp_router_id}\n')
-        # Enable IPv4 forwarding
-        self.cmd('sysctl -w net.ipv4.ip_forward=1')
-        # Disable reverse path filtering
-        self.cmd('sysctl -w net.ipv4.conf.all.rp_filter=0')
-        self.cmd('sysctl -w net.ipv4.conf.default.rp_filter=0')
-        # Enable loose mode for reverse path filtering
-        for intf in self.intfList():
-            self.cmd(f'sysctl -w net.ipv4.conf.{intf.name}.rp_filter=0')
-        
-    def setup_frr(self, peers=None):
-        """Configure FRR with BGP settings"""
-        print(f'[DEBUG][setup_frr-start] {self.name}: ASN={self.bgp_asn}, router_id={self.bgp_router_id}, peers={peers}')
-        info(f'*** Setting up FRR for {self.name} with ASN {self.bgp_asn} and router ID {self.bgp_router_id}\n')
-        
-        # Stop any existing FRR processes for this router
-        self.cmd(f'pkill -f "zebra.*{self.name}"')
-        self.cmd(f'pkill -f "bgpd.*{self.name}"')
-        time.sleep(2)
-        
-        # Clean and create FRR directory
-        self.cmd(f'rm -rf {self.frr_dir}')
-        self.cmd(f'mkdir -p {self.frr_dir}')
-        self.cmd(f'chown frr:frr {self.frr_dir}')
-        
-        # Create required subdirectories
-        for subdir in ['run', 'log', 'sockets']:
-            self.cmd(f'mkdir -p {self.frr_dir}/{subdir}')
-            self.cmd(f'chown frr:frr {self.frr_dir}/{subdir}')
-        
-        # Generate daemons config
-        daemons_conf = """zebra=yes
+# Looked up once; every file and directory in a router's FRR tree is owned by frr
+_FRR_UID = pwd.getpwnam('frr').pw_uid
+_FRR_GID = grp.getgrnam('frr').gr_gid
+
+# FRR daemons file: only zebra and bgpd are enabled, identical for every router.
+# bgpd is best built with --disable-bgp-vnc --disable-bgp-bmp: neither is used
+# here and the VNC hooks measurably slow convergence.
+DAEMONS_CONF = """zebra=yes
 bgpd=yes
 ospfd=no
 ospf6d=no
@@ -89,10 +58,110 @@ fabricd=no
 vrrpd=no
 pathd=no"""
 
+def _wait_for(predicate, timeout, interval=0.05):
+    """Poll predicate until it returns truthy or timeout seconds pass; returns its last result"""
+    deadline = time.time() + timeout
+    while True:
+        result = predicate()
+        if result or time.time() > deadline:
+            return result
+        time.sleep(interval)
+
+class BGPRouter(Host):
+    """Custom host class to configure FRR BGP routers"""
+    
+    _bgpd_version = None  # `bgpd --version` output, read once and shared by all routers
+    _has_pcre2 = None  # bgpd PCRE2 check result, shared by all routers
+    
+    def __init__(self, name, **params):
+        """Initialize the BGP router with ASN"""
+        self.bgp_asn = params.pop('asn')  # Store ASN before parent init
+        self.bgp_router_id = params.pop('router_id')  # Store router_id before parent init
+        self.frr_dir = f'/tmp/frr-{name}'  # Use /tmp/frr-{name} for per-router isolation
+        self._frr_started = False
+        self._last_peers = None
+        debug(f'*** Initializing BGP Router {name} with ASN {self.bgp_asn} '
+              f'and router ID {self.bgp_router_id}\n')
+        super(BGPRouter, self).__init__(name, **params)
+    
+    def config(self, **params):
+        super(BGPRouter, self).config(**params)
+        debug(f'*** Configuring BGP Router {self.name} with ASN {self.bgp_asn} '
+              f'and router ID {self.bgp_router_id}\n')
+        # Enable IPv4 forwarding and disable reverse path filtering (all, default
+        # and per interface) with a single sysctl invocation
+        kvs = ['net.ipv4.ip_forward=1',
+               'net.ipv4.conf.all.rp_filter=0',
+               'net.ipv4.conf.default.rp_filter=0']
+        kvs += [f'net.ipv4.conf.{intf.name}.rp_filter=0' for intf in self.intfList()]
+        self.cmd('sysctl -w ' + ' '.join(kvs))
+        self._check_pcre2()
+    
+    def _bgpd_version_text(self):
+        """Return the installed bgpd's --version output (cached for the run)"""
+        if BGPRouter._bgpd_version is None:
+            try:
+                BGPRouter._bgpd_version = subprocess.run(['/usr/lib/frr/bgpd', '--version'],
+                                                         capture_output=True, text=True).stdout
+            except OSError:
+                BGPRouter._bgpd_version = ''
+        return BGPRouter._bgpd_version
+    
+    def _has_fast_convergence(self):
+        """'bgp fast-convergence' only exists from FRR 8.0 on (Ubuntu 20.04 ships 7.2.1)"""
+        match = re.search(r'version (\d+)\.', self._bgpd_version_text())
+        return bool(match) and int(match.group(1)) >= 8
+    
+    def _check_pcre2(self):
+        """Warn (once per run) if the installed bgpd was built without PCRE2 regex support"""
+        if BGPRouter._has_pcre2 is None:
+            BGPRouter._has_pcre2 = 'pcre2' in self._bgpd_version_text().lower()
+            if not BGPRouter._has_pcre2:
+                error('*** Warning: /usr/lib/frr/bgpd lacks PCRE2 support; rebuild FRR with '
+                      '--enable-pcre2posix (add it to debian/rules) for faster '
+                      'prefix-list/route-map regex matching\n')
+        return BGPRouter._has_pcre2
+        
+    def setup_frr(self, peers=None, verify=False):
+        """Configure FRR with BGP settings; verify=True also dumps config and status via vtysh"""
+        # Already running with this peer set: nothing to redo
+        if (self._frr_started and peers == self._last_peers
+                and self._daemon_running('zebra') and self._daemon_running('bgpd')):
+            return
+        debug(f'*** Setting up FRR for {self.name} with ASN {self.bgp_asn}, '
+              f'router ID {self.bgp_router_id} and peers {peers}\n')
+        self.write_frr_config(peers)
+        self.start_frr(verify)
+        self._frr_started = True
+        self._last_peers = peers
+    
+    def write_frr_config(self, peers=None):
+        """Stop any previous daemons and write a fresh FRR config tree for this router"""
+        # Stop any existing FRR processes for this router and wait until they are gone
+        # (signal the pids from the pid files rather than regex-matching every cmdline)
+        old_pids = [pid for pid in (self._read_pid('zebra'), self._read_pid('bgpd')) if pid]
+        for pid in old_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        _wait_for(lambda: not any(os.path.exists(f'/proc/{pid}') for pid in old_pids), timeout=2)
+        
+        # Clean and create FRR directory
+        # The tree lives on the host filesystem, so no namespace shell is needed
+        shutil.rmtree(self.frr_dir, ignore_errors=True)
+        os.makedirs(self.frr_dir)
+        os.chown(self.frr_dir, _FRR_UID, _FRR_GID)
+        
+        # Create required subdirectories
+        for subdir in ['run', 'log', 'sockets']:
+            os.makedirs(f'{self.frr_dir}/{subdir}', exist_ok=True)
+            os.chown(f'{self.frr_dir}/{subdir}', _FRR_UID, _FRR_GID)
+        
         # Write daemons config
-        with open(f'{self.frr_dir}/daemons', 'w') as f:
-            f.write(daemons_conf)
-        self.cmd(f'chmod 640 {self.frr_dir}/daemons')
+        Path(f'{self.frr_dir}/daemons').write_text(DAEMONS_CONF)
+        os.chown(f'{self.frr_dir}/daemons', _FRR_UID, _FRR_GID)
+        os.chmod(f'{self.frr_dir}/daemons', 0o640)
         
         # Generate vtysh config
         vtysh_conf = f"""hostname {self.name}
@@ -103,124 +172,136 @@ service integrated-vtysh-config
 log file {self.frr_dir}/log/frr.log informational
 """
         
-        # Write vtysh config
-        with open(f'{self.frr_dir}/vtysh.conf', 'w') as f:
-            f.write(vtysh_conf)
-        self.cmd(f'chmod 644 {self.frr_dir}/vtysh.conf')
+        # Write vtysh config, plus the per-router copy under /etc/frr
+        for path in (Path(self.frr_dir) / 'vtysh.conf', Path(f'/etc/frr/vtysh-{self.name}.conf')):
+            path.write_text(vtysh_conf)
+            os.chmod(path, 0o644)
+        os.chown(f'{self.frr_dir}/vtysh.conf', _FRR_UID, _FRR_GID)
         
         # Generate integrated FRR config
-        print(f'[DEBUG][setup_frr-preconf] {self.name}: ASN={self.bgp_asn}, router_id={self.bgp_router_id}, peers={peers}')
-        frr_conf = f"""frr version 7.2.1
-frr defaults traditional
-!
-hostname {self.name}
-!
-service integrated-vtysh-config
-!
-log timestamp precision 6
-log file {self.frr_dir}/log/frr.log debugging
-!
-interface {self.name}-eth0
- description Connection to Switch
- ip address {self.IP()}/24
- no shutdown
-!
-interface {self.name}-peer
- description BGP Peering Link
- ip address {self.params['ip']}/24
- no shutdown
-!
-router bgp {self.bgp_asn}
- bgp router-id {self.bgp_router_id}
- bgp graceful-restart
- no bgp ebgp-requires-policy
- no bgp default ipv4-unicast
- no bgp network import-check
- bgp bestpath as-path multipath-relax
- timers bgp 3 9
-"""
-        if peers:
-            for peer in peers:
-                frr_conf += f" neighbor {peer['ip']} remote-as {peer['asn']}\n"
-                frr_conf += f" neighbor {peer['ip']} description Peer with {peer['asn']}\n"
-                frr_conf += f" neighbor {peer['ip']} timers 3 9\n"
-                frr_conf += f" neighbor {peer['ip']} timers connect 5\n"
-        
-        frr_conf += "!\n address-family ipv4 unicast\n"
-        frr_conf += f" network {self.IP()}/24\n"
-        if peers:
-            for peer in peers:
-                frr_conf += f" neighbor {peer['ip']} activate\n"
-                frr_conf += f" neighbor {peer['ip']} next-hop-self\n"
-                frr_conf += f" neighbor {peer['ip']} soft-reconfiguration inbound\n"
-        frr_conf += " maximum-paths 64\n"
-        frr_conf += " redistribute connected\n"
-        frr_conf += " exit-address-family\n!\n"
+        own_ip = self.IP()
+        peer_ip = self.params['ip']
+        peer_lines, afi_lines = [], []
+        for peer in peers or []:
+            peer_lines += [f" neighbor {peer['ip']} remote-as {peer['asn']}",
+                           f" neighbor {peer['ip']} description Peer with {peer['asn']}",
+                           f" neighbor {peer['ip']} timers 3 9",
+                           f" neighbor {peer['ip']} timers connect 5"]
+            afi_lines += [f" neighbor {peer['ip']} activate",
+                          f" neighbor {peer['ip']} next-hop-self",
+                          f" neighbor {peer['ip']} soft-reconfiguration inbound"]
+        parts = ['frr version 7.2.1',
+                 'frr defaults traditional',
+                 '!',
+                 f'hostname {self.name}',
+                 '!',
+                 'service integrated-vtysh-config',
+                 '!',
+                 'log timestamp precision 6',
+                 f'log file {self.frr_dir}/log/frr.log debugging',
+                 '!',
+                 f'interface {self.name}-eth0',
+                 ' description Connection to Switch',
+                 f' ip address {own_ip}/24',
+                 ' no shutdown',
+                 '!',
+                 f'interface {self.name}-peer',
+                 ' description BGP Peering Link',
+                 f' ip address {peer_ip}/24',
+                 ' no shutdown',
+                 '!',
+                 f'router bgp {self.bgp_asn}',
+                 f' bgp router-id {self.bgp_router_id}',
+                 ' bgp graceful-restart',
+                 ' no bgp ebgp-requires-policy',
+                 ' no bgp default ipv4-unicast',
+                 ' no bgp network import-check',
+                 ' bgp bestpath as-path multipath-relax']
+        if self._has_fast_convergence():
+            parts.append(' bgp fast-convergence')
+        parts += [' timers bgp 3 9']
+        parts += peer_lines
+        
+        parts += ['!', ' address-family ipv4 unicast', f' network {own_ip}/24']
+        parts += afi_lines
+        parts += [' maximum-paths 64',
+                  ' redistribute connected',
+                  ' exit-address-family',
+                  '!']
         
         # Add line vty config
-        frr_conf += """!
-line vty
-!"""
+        parts += ['!', 'line vty', '!']
         
         # Write FRR config
-        with open(f'{self.frr_dir}/frr.conf', 'w') as f:
-            f.write(frr_conf)
+        Path(f'{self.frr_dir}/frr.conf').write_text('\n'.join(parts) + '\n')
         
         # Set permissions
-        self.cmd(f'chown -R frr:frr {self.frr_dir}')
-        self.cmd(f'chmod 640 {self.frr_dir}/frr.conf')
-        # Install kernel static route as a fail-static fallback
-        for peer in peers or []:
-            # derive remote /24 subnet from peer IP
-            net = peer['ip'].rsplit('.', 1)[0] + '.0/24'
-            self.cmd(f'ip route add {net} via {peer["ip"]}')
-        
-        # Create a custom vtysh.conf for this router
-        vtysh_conf = f"""hostname {self.name}
-username root nopassword
-!
-service integrated-vtysh-config
-!
-log file {self.frr_dir}/log/frr.log informational
-"""
-        with open(f'/etc/frr/vtysh-{self.name}.conf', 'w') as f:
-            f.write(vtysh_conf)
-        self.cmd(f'chmod 644 /etc/frr/vtysh-{self.name}.conf')
-        
+        os.chown(f'{self.frr_dir}/frr.conf', _FRR_UID, _FRR_GID)
+        os.chmod(f'{self.frr_dir}/frr.conf', 0o640)
+        # Install kernel static routes as a fail-static fallback
+        # (remote /24 subnet derived from each peer IP)
+        self.add_static_routes([(peer['ip'].rsplit('.', 1)[0] + '.0/24', peer['ip'])
+                                for peer in peers or []])
+    
+    def add_static_routes(self, routes):
+        """Install (prefix, via) kernel routes with a single ip -batch process"""
+        if routes:
+            batch = ' '.join(f"'route add {net} via {via}'" for net, via in routes)
+            self.cmd(f'printf "%s\\n" {batch} | ip -force -batch -')
+    
+    def start_frr(self, verify=False):
+        """Spawn zebra and bgpd on the written config and wait for them to come up"""
         # Start FRR daemons with namespace-aware configuration
         info(f'*** Starting FRR daemons for {self.name}\n')
         
         # Start Zebra with custom config
-        zebra_cmd = f'/usr/lib/frr/zebra -d ' \
-                    f'-f {self.frr_dir}/frr.conf ' \
-                    f'-i {self.frr_dir}/run/zebra.pid ' \
-                    f'-z {self.frr_dir}/sockets/zserv.api ' \
-                    f'--vty_socket {self.frr_dir}/sockets ' \
-                    f'--config_file {self.frr_dir}/frr.conf ' \
-                    f'--pid_file {self.frr_dir}/run/zebra.pid ' \
-                    f'--socket {self.frr_dir}/sockets/zserv.api ' \
-                    f'--vty_addr 127.0.0.1 ' \
-                    f'--vty_port 0'
-        self.zebra = self.popen(zebra_cmd, shell=True)
-        time.sleep(3)
+        self.zebra = self.popen(self._daemon_argv('zebra'))
+        if not _wait_for(lambda: self._daemon_running('zebra'), timeout=3):
+            error(f'*** zebra did not come up on {self.name}\n')
         
         # Start BGPd with custom config
-        bgpd_cmd = f'/usr/lib/frr/bgpd -d ' \
-                   f'-f {self.frr_dir}/frr.conf ' \
-                   f'-i {self.frr_dir}/run/bgpd.pid ' \
-                   f'-z {self.frr_dir}/sockets/zserv.api ' \
-                   f'--vty_socket {self.frr_dir}/sockets ' \
-                   f'--config_file {self.frr_dir}/frr.conf ' \
-                   f'--pid_file {self.frr_dir}/run/bgpd.pid ' \
-                   f'--socket {self.frr_dir}/sockets/zserv.api ' \
-                   f'--vty_addr 127.0.0.1 ' \
-                   f'--vty_port 0'
-        self.bgpd = self.popen(bgpd_cmd, shell=True)
-        time.sleep(2)
-        
-        # Verify configuration and BGP status
-        info(f'*** Verifying FRR configuration for {self.name}\n')
-        self._verify_frr_status()
+        self.bgpd = self.popen(self._daemon_argv('bgpd'))
+        if not _wait_for(lambda: self._daemon_running('bgpd'), timeout=2):
+            error(f'*** bgpd did not come up on {self.name}\n')
+        
+        # The vtysh dumps are a per-router tax on bring-up; run them only on request
+        # (or later from the CLI with verifyfrr)
+        if verify:
+            info(f'*** Verifying FRR configuration for {self.name}\n')
+            self._verify_frr_status()
+    
+    def _daemon_argv(self, daemon):
+        """argv for launching an FRR daemon directly (no shell); it daemonizes itself via -d"""
+        return [f'/usr/lib/frr/{daemon}', '-d',
+                '-f', f'{self.frr_dir}/frr.conf',
+                '-i', f'{self.frr_dir}/run/{daemon}.pid',
+                '-z', f'{self.frr_dir}/sockets/zserv.api',
+                '--vty_socket', f'{self.frr_dir}/sockets',
+                '--vty_addr', '127.0.0.1',
+                '--vty_port', '0']
+    
+    def _read_pid(self, daemon):
+        """Return the pid recorded in daemon's pid file, or None"""
+        try:
+            with open(f'{self.frr_dir}/run/{daemon}.pid') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+    
+    def _daemon_running(self, daemon):
+        """True once daemon's pid file exists and names a live process"""
+        pid = self._read_pid(daemon)
+        return pid is not None and os.path.exists(f'/proc/{pid}')
+    
+    def bgp_established(self):
+        """Return True once every configured BGP peer is in Established state"""
+        output = self.cmd(f'vtysh --config_dir {self.frr_dir} --vty_socket {self.frr_dir}/sockets '
+                          f'-c "show ip bgp summary json"')
+        try:
+            peers = json.loads(output)['ipv4Unicast']['peers']
+        except (ValueError, KeyError):
+            return False
+        return bool(peers) and all(p.get('state') == 'Established' for p in peers.values())
     
     def _verify_frr_status(self):
         """Verify FRR daemon status and configuration"""
@@ -243,18 +324,18 @@ log file {self.frr_dir}/log/frr.log informational
                     f'--config_dir {self.frr_dir} ' \
                     f'--vty_socket {self.frr_dir}/sockets ' \
                     f'-c "show running-config"'
-        self.cmd(vtysh_cmd)
+        info(self.cmd(vtysh_cmd))
         
         # Check BGP status
         vtysh_cmd = f'VTYSH_PAGER=cat vtysh ' \
                     f'--config_dir {self.frr_dir} ' \
                     f'--vty_socket {self.frr_dir}/sockets ' \
                     f'-c "show ip bgp summary"'
-        self.cmd(vtysh_cmd)
+        info(self.cmd(vtysh_cmd))
         
         # Check routing table
         info(f'*** Routing table for {self.name}:\n')
-        self.cmd('ip route')
+        info(self.cmd('ip route'))
         
         return True
 
@@ -330,77 +411,70 @@ class SDNBGPExperiment:
         
         # Configure flow tables with specific rules for known routes
         for switch in [s1, s2]:
-            switch.cmd('ovs-vsctl set bridge {} protocols=OpenFlow13'.format(switch.name))
-            switch.cmd('ovs-ofctl -O OpenFlow13 del-flows {}'.format(switch.name))
-            
             # ARP packets: flood
-            switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0806,actions=FLOOD"'.format(switch.name))
+            rules = ['table=0,priority=100,dl_type=0x0806,actions=FLOOD']
             
             # ICMP packets: forward based on destination
             if switch.name == 's1':
                 # s1: forward to h1 or bgp1 based on destination
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.1.2,actions=output:1"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.1.1,actions=output:2"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=50,dl_type=0x0800,actions=output:2"'.format(switch.name))
+                rules += ['table=0,priority=100,dl_type=0x0800,nw_dst=10.0.1.2,actions=output:1',
+                          'table=0,priority=100,dl_type=0x0800,nw_dst=10.0.1.1,actions=output:2',
+                          'table=0,priority=50,dl_type=0x0800,actions=output:2']
             else:
                 # s2: forward to h2 or bgp2 based on destination
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.2.2,actions=output:1"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=100,dl_type=0x0800,nw_dst=10.0.2.1,actions=output:2"'.format(switch.name))
-                switch.cmd('ovs-ofctl -O OpenFlow13 add-flow {} "table=0,priority=50,dl_type=0x0800,actions=output:2"'.format(switch.name))
+                rules += ['table=0,priority=100,dl_type=0x0800,nw_dst=10.0.2.2,actions=output:1',
+                          'table=0,priority=100,dl_type=0x0800,nw_dst=10.0.2.1,actions=output:2',
+                          'table=0,priority=50,dl_type=0x0800,actions=output:2']
+            
+            # One ovs-vsctl for the protocol version, then one bundled ovs-ofctl that
+            # atomically replaces the whole table (the old del-flows + add-flow sequence)
+            switch.cmd('ovs-vsctl set bridge {0} protocols=OpenFlow13 && '
+                       'printf "{1}\\n" | ovs-ofctl -O OpenFlow13 --bundle replace-flows {0} -'
+                       .format(switch.name, '\\n'.join(rules)))
 
         # Configure BGP routers
         info('*** Configuring BGP routers\n')
-        # Configure BGP for router 1 (AS 65001)
-        bgp1.setup_frr(
-            peers=[{
-                'ip': '10.0.12.2',
-                'asn': 65002
-            }]
-        )
-        
-        # Configure BGP for router 2 (AS 65002)
-        bgp2.setup_frr(
-            peers=[{
-                'ip': '10.0.12.1',
-                'asn': 65001
-            }]
-        )
+        # Configure BGP for router 1 (AS 65001) and router 2 (AS 65002) concurrently
+        self._setup_routers([
+            (bgp1, [{'ip': '10.0.12.2', 'asn': 65002}]),
+            (bgp2, [{'ip': '10.0.12.1', 'asn': 65001}]),
+        ])
         
         # Add static routes for direct networks
-        bgp1.cmd('ip route add 10.0.2.0/24 via 10.0.12.2')
-        bgp2.cmd('ip route add 10.0.1.0/24 via 10.0.12.1')
+        bgp1.add_static_routes([('10.0.2.0/24', '10.0.12.2')])
+        bgp2.add_static_routes([('10.0.1.0/24', '10.0.12.1')])
         
         # Verify connectivity between BGP routers
         info('*** Verifying BGP router connectivity\n')
-        bgp1.cmd('ping -c 1 10.0.12.2')
-        bgp2.cmd('ping -c 1 10.0.12.1')
+        # Send both pings before waiting so they run concurrently
+        bgp1.sendCmd('ping -c 1 10.0.12.2')
+        bgp2.sendCmd('ping -c 1 10.0.12.1')
+        bgp1.waitOutput()
+        bgp2.waitOutput()
         
         self.net.experiment = self  # Attach the experiment instance to the Mininet object
         
     def configure_bgp(self):
-        """Configure BGP on the routers"""
-        
-        # Configure BGP for Router 1 (AS 65001)
-        self.net.get('bgp1').setup_frr(
-            peers=[{'ip': '10.0.12.2', 'asn': 65002}]
-        )
-        
-        # Configure BGP for Router 2 (AS 65002)
-        self.net.get('bgp2').setup_frr(
-            peers=[{'ip': '10.0.12.1', 'asn': 65001}]
-        )
+        """Wait for the BGP sessions set up in setup_topology and verify them"""
         
         # Wait for BGP to establish
         info('*** Waiting for BGP to establish\n')
-        time.sleep(10)
+        self._wait_for_bgp([self.net.get('bgp1'), self.net.get('bgp2')])
         
         # Verify BGP status
         info('*** Verifying BGP status\n')
-        for router in ['bgp1', 'bgp2']:
-            info(f'*** {router} BGP status:\n')
-            self.net.get(router).cmd('vtysh -c "show ip bgp summary"')
-            self.net.get(router).cmd('vtysh -c "show ip route"')
-            self.net.get(router).cmd('vtysh -c "show ip bgp neighbors"')
+        # A host shell runs one command at a time, so send each router its three
+        # shows as one vtysh call against its own daemons, then collect both
+        # routers' output
+        routers = [self.net.get('bgp1'), self.net.get('bgp2')]
+        for r in routers:
+            r.sendCmd(f'VTYSH_PAGER=cat vtysh --config_dir {r.frr_dir} '
+                      f'--vty_socket {r.frr_dir}/sockets '
+                      '-c "show ip bgp summary" -c "show ip route" '
+                      '-c "show ip bgp neighbors"')
+        for r in routers:
+            info(f'*** {r.name} BGP status:\n')
+            info(r.waitOutput())
         
         # Verify connectivity
         info('*** Verifying connectivity\n')
@@ -408,6 +482,20 @@ class SDNBGPExperiment:
         if '1 received' not in result:
             error('*** Warning: Initial connectivity test failed\n')
         
+    def _setup_routers(self, router_peers):
+        """Run setup_frr on independent routers in parallel, one worker per router"""
+        with ThreadPoolExecutor(max_workers=len(router_peers)) as ex:
+            list(ex.map(lambda rp: rp[0].setup_frr(peers=rp[1]), router_peers))
+    
+    def _wait_for_bgp(self, routers, timeout=30):
+        """Poll all routers' BGP summaries in parallel until every session is Established"""
+        with ThreadPoolExecutor(max_workers=len(routers)) as ex:
+            established = _wait_for(lambda: all(ex.map(lambda r: r.bgp_established(), routers)),
+                                    timeout=timeout, interval=0.5)
+        if not established:
+            error('*** Warning: BGP sessions not established\n')
+        return established
+        
     def start_experiment(self):
         """Start the experiment environment"""
         self.setup_topology()
@@ -433,8 +521,9 @@ class SDNBGPExperiment:
         info('*** To check switch flows:\n')
         info('    s1 ovs-ofctl -O OpenFlow13 dump-flows s1\n')
         
-        # Start CLI
-        CustomCLI(self.net)
+        # Start CLI; pass sys.stdin explicitly since CLI's default is bound at import time
+        # (stale when run from experiment_daemon.py's forkserver)
+        CustomCLI(self.net, stdin=sys.stdin)
         
     def stop_experiment(self):
         """Clean up the experiment"""
@@ -456,6 +545,7 @@ class SDNBGPExperiment:
             r.cmd('ip route flush cache')
             info(f'*** Restarting FRR daemons on {router}\n')
             r.cmd('pkill bgpd; pkill zebra; pkill staticd; sleep 1')
+            r._frr_started = False  # force setup_frr to redo the full bring-up
             # Optionally, re-run setup_frr to re-apply config and restart daemons
             if hasattr(r, 'setup_frr'):
                 # You may want to pass the correct peers again
@@ -478,6 +568,17 @@ class CustomCLI(CLI):
         else:
             print("*** Error: Experiment object with recovery method not found.")
 
+    def do_verifyfrr(self, line):
+        """
+        verifyfrr
+        Check that zebra and bgpd are running on bgp1 and bgp2 and show their config, BGP summary and routes.
+        Usage: verifyfrr
+        """
+        for router in ['bgp1', 'bgp2']:
+            r = self.mn.get(router)
+            info(f'*** Verifying FRR configuration for {router}\n')
+            r._verify_frr_status()
+
     def do_startfrr(self, line):
         """
         startfrr
@@ -492,20 +593,37 @@ class CustomCLI(CLI):
                 # Clean up old run/sockets files
                 r.cmd(f'rm -rf {frr_dir}/run/*')
                 r.cmd(f'rm -rf {frr_dir}/sockets/*')
-                # Start zebra
-                zebra_cmd = f'/usr/lib/frr/zebra -d -f {frr_dir}/frr.conf -i {frr_dir}/run/zebra.pid -z {frr_dir}/sockets/zserv.api --vty_socket {frr_dir}/sockets --config_file {frr_dir}/frr.conf --pid_file {frr_dir}/run/zebra.pid --socket {frr_dir}/sockets/zserv.api --vty_addr 127.0.0.1 --vty_port 0'
-                r.cmd(zebra_cmd)
+                # Start zebra, then bgpd; with -d each launcher exits once its daemon
+                # has detached, so wait() on it rather than leave a zombie behind
+                r.popen(r._daemon_argv('zebra')).wait(timeout=5)
                 time.sleep(2)
-                # Start bgpd
-                bgpd_cmd = f'/usr/lib/frr/bgpd -d -f {frr_dir}/frr.conf -i {frr_dir}/run/bgpd.pid -z {frr_dir}/sockets/zserv.api --vty_socket {frr_dir}/sockets --config_file {frr_dir}/frr.conf --pid_file {frr_dir}/run/bgpd.pid --socket {frr_dir}/sockets/zserv.api --vty_addr 127.0.0.1 --vty_port 0'
-                r.cmd(bgpd_cmd)
+                r.popen(r._daemon_argv('bgpd')).wait(timeout=5)
                 print(f"*** FRR daemons started for {router}")
             except Exception as e:
                 print(f"*** Error starting FRR daemons for {router}: {e}")
 
+def assert_epoll_frr(bgpd='/usr/lib/frr/bgpd'):
+    """Warn if FRR's event loop (bgpd or the libfrr it links) uses poll() instead of epoll()"""
+    binaries = [bgpd]
+    try:
+        ldd = subprocess.run(['ldd', bgpd], capture_output=True, text=True).stdout
+        binaries += [line.split('=>')[1].split()[0] for line in ldd.splitlines()
+                     if 'libfrr.so' in line and '=>' in line]
+        symbols = subprocess.run(['nm', '-D'] + binaries, capture_output=True, text=True).stdout
+    except (OSError, IndexError):
+        error(f'*** Warning: could not inspect {bgpd} for epoll support\n')
+        return False
+    if 'epoll_wait' in symbols:
+        return True
+    error(f'*** Warning: {bgpd} uses a poll()-based event loop; system CPU grows '
+          'quadratically with peer count. Patch libfrr thread.c to use epoll before '
+          'scaling beyond a handful of peers\n')
+    return False
+
 def main():
     """Main function to run the experiment"""
     setLogLevel('info')
+    assert_epoll_frr()
     
     experiment = SDNBGPExperiment()
     try:
@@ -63,37 +63,53 @@ from mininet.node import RemoteController
 from mininet.link import TCLink
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info
-import threading, time, os, subprocess
+import threading, time, os, shutil, subprocess, json, socket, select, codecs
+from concurrent.futures import ThreadPoolExecutor
 
 # ---------- SDN Switch with Health Monitoring ----------
 from mininet.node import OVSSwitch
+OVSDB_SOCK = '/var/run/openvswitch/db.sock'
+# built once: the JSON-RPC monitor request, and the batched fallback query (argv, no shell)
+_HEALTH_MONITOR = json.dumps({'id': 0, 'method': 'monitor', 'params': ['Open_vSwitch', None, {
+    'Bridge': {'columns': ['name', 'controller']}, 'Controller': {'columns': ['is_connected']}}]}).encode()
+_HEALTH_QUERY = ['ovs-vsctl', '--format=json',
+                 '--', '--columns=name,controller', 'list', 'Bridge',
+                 '--', '--columns=_uuid,is_connected', 'list', 'Controller']
+def _ovs_uuids(v):
+    # OVSDB JSON ref column: ["uuid", u] for one row, ["set", [["uuid", u], ...]] otherwise
+    return [u for _, u in v[1]] if v[0] == 'set' else [v[1]]
 class HealthAwareSwitch(OVSSwitch):
-    def __init__(self, name, **params):
+    def __init__(self, name, monitor=True, **params):
+        # monitor=False: fail-static runs that don't care about controller reachability
+        self.monitor_enabled = monitor
+        # OVSSwitch's default failMode='secure' is set when start() creates the bridge
         super().__init__(name, **params)
         self.health_state = 'healthy'
-        self.monitor = None
-    def start(self, controllers):
-        super().start(controllers)
-        # kick off background health check
-        self.monitor = threading.Thread(target=self._monitor_ctrl, daemon=True)
-        self.monitor.start()
-    def _monitor_ctrl(self):
-        ip = self.controllers[0].IP()
-        while True:
-            res = self.cmd(f'ping -c1 -W1 {ip}')
-            state = 'healthy' if '1 received' in res else 'unknown'
-            if state != self.health_state:
-                info(f"*** {self.name} health: {self.health_state} -> {state}\n")
-                self.health_state = state
-            time.sleep(2)
+    def set_health(self, state):
+        # called by CombinedExperiment's shared health thread
+        if state == self.health_state: return False
+        info(f"*** {self.name} health: {self.health_state} -> {state}\n")
+        self.health_state = state
+        return True
+    def stop_monitor(self):
+        # drop out of health dispatch; called by CombinedExperiment.stop_monitor() before
+        # net.stop(), which tears OVS down in a batch and never calls switch.stop()
+        self.monitor_enabled = False
 
 # ---------- BGP Router using FRR ----------
 from mininet.node import Host
+from pathlib import Path
+# static FRR files as ready-to-write bytes; vtysh.conf only needs the hostname filled in
+DAEMONS = b'zebra=yes\nbgpd=yes\n'
+VTYSH_CONF = b'hostname %s\nservice integrated-vtysh-config\n!'
 class BGPRouter(Host):
+    READY_POLLS = 100       # readiness probe cap: 100 x 20 ms = 2 s per daemon
+    READY_INTERVAL = 0.02
     def __init__(self, name, **params):
         self.bgp_asn      = params.pop('asn')
         self.bgp_router_id= params.pop('router_id')
         self.frr_dir      = f'/tmp/frr-{name}'
+        self._frr_conf_cache = None  # (peers, frr.conf bytes)
         info(f"*** Init BGP Router {name} ASN={self.bgp_asn}\n")
         super(BGPRouter, self).__init__(name, **params)
     def config(self, **params):
@@ -105,47 +121,70 @@ class BGPRouter(Host):
             self.cmd(f'sysctl -w net.ipv4.conf.{intf.name}.rp_filter=0')
     def setup_frr(self, peers=None):
         # stop old
-        self.cmd(f'pkill -f zebra.*{self.name} || true')
-        self.cmd(f'pkill -f bgpd.*{self.name} || true')
+        self.cmd(f"pkill -f 'zebra.*{self.name}|bgpd.*{self.name}' || true")
         time.sleep(1)
         # prepare dirs
-        self.cmd(f'rm -rf {self.frr_dir} && mkdir -p {self.frr_dir}/' + 'run sockets log'.replace(' ', f'/{self.frr_dir}/'))
+        d = self.frr_dir
+        shutil.rmtree(d, ignore_errors=True)
+        for sub in ('run', 'sockets', 'log'): os.makedirs(f'{d}/{sub}', exist_ok=True)
         # daemons file
-        da = 'zebra=yes\nbgpd=yes'
-        with open(f'{self.frr_dir}/daemons','w') as f: f.write(da)
+        Path(f'{d}/daemons').write_bytes(DAEMONS)
         # vtysh
-        v = f"hostname {self.name}\nservice integrated-vtysh-config\n!"
-        with open(f'{self.frr_dir}/vtysh.conf','w') as f: f.write(v)
-        # FRR conf
-        intf = self.name + '-eth0'
-        frr = [
-            'frr version 7.2.1',
-            'frr defaults traditional',
-            f'hostname {self.name}',
-            '!',
-            f'interface {intf}', f' ip address {self.IP()}', ' no shutdown', '!',
-            f'router bgp {self.bgp_asn}', f' bgp router-id {self.bgp_router_id}',
-            ' no bgp ebgp-requires-policy', ' no bgp default ipv4-unicast',
-        ]
-        if peers:
-            for p in peers:
-                frr += [f" neighbor {p['ip']} remote-as {p['asn']}"]
-        frr += ['!', 'address-family ipv4 unicast']
-        frr += [f' network {self.IP()}/24']
-        if peers:
-            for p in peers:
-                frr += [f" neighbor {p['ip']} activate", ' exit-address-family']
-        with open(f'{self.frr_dir}/frr.conf','w') as f: f.write('\n'.join(frr))
-        # start zebra & bgpd
-        self.popen(f'zebra -d -f {self.frr_dir}/frr.conf')
-        time.sleep(1)
-        self.popen(f'bgpd -d -f {self.frr_dir}/frr.conf')
-        time.sleep(2)
+        Path(f'{d}/vtysh.conf').write_bytes(VTYSH_CONF % self.name.encode())
+        # FRR conf: fixed per router, so build it once and reuse it on recovery
+        if self._frr_conf_cache is None or self._frr_conf_cache[0] != peers:
+            intf = self.name + '-eth0'
+            frr = [
+                'frr version 7.2.1',
+                'frr defaults traditional',
+                f'hostname {self.name}',
+                '!',
+                f'interface {intf}', f' ip address {self.IP()}', ' no shutdown', '!',
+                f'router bgp {self.bgp_asn}', f' bgp router-id {self.bgp_router_id}',
+                ' no bgp ebgp-requires-policy', ' no bgp default ipv4-unicast',
+            ]
+            if peers:
+                for p in peers:
+                    frr += [f" neighbor {p['ip']} remote-as {p['asn']}"]
+            frr += ['!', 'address-family ipv4 unicast']
+            frr += [f' network {self.IP()}/24']
+            if peers:
+                for p in peers:
+                    frr += [f" neighbor {p['ip']} activate", ' exit-address-family']
+            self._frr_conf_cache = (peers, '\n'.join(frr).encode())
+        Path(f'{d}/frr.conf').write_bytes(self._frr_conf_cache[1])
+        # start zebra & bgpd, each on this router's own pid/vty/zserv paths, and wait
+        # for its vty socket instead of sleeping a fixed worst case
+        for daemon in ('zebra', 'bgpd'):
+            self.popen([daemon, '-d', '-f', f'{d}/frr.conf', '-i', f'{d}/run/{daemon}.pid',
+                        '-z', f'{d}/sockets/zserv.api', '--vty_socket', f'{d}/sockets'])
+            if not self._wait_ready(f'{d}/sockets/{daemon}.vty'):
+                info(f"*** {daemon} on {self.name} not ready after {self.READY_POLLS * self.READY_INTERVAL:.1f}s\n")
         info(f"*** FRR started on {self.name}\n")
+    def vtysh(self, cmd):
+        # one-shot vtysh: a piped vtysh session gives no reliable end-of-reply marker
+        return self.cmd(f'vtysh --vty_socket {self.frr_dir}/sockets -c "{cmd}"')
+    def _wait_ready(self, path):
+        for _ in range(self.READY_POLLS):
+            if os.path.exists(path): return True
+            time.sleep(self.READY_INTERVAL)
+        return False
+
+def _parallel_cmd(nodes, argv_fn):
+    # switches live in the root namespace: start every ovs-vsctl at once, then reap them all
+    procs = [subprocess.Popen(argv_fn(n)) for n in nodes]
+    for p in procs: p.wait()
+
+def _setup_routers(router_peers):
+    # setup_frr is sleep/subprocess bound, so routers can come up side by side
+    with ThreadPoolExecutor(max_workers=len(router_peers)) as ex:
+        list(ex.map(lambda rp: rp[0].setup_frr(peers=rp[1]), router_peers))
 
 # ---------- Combined Experiment ----------
 class CombinedExperiment:
-    def __init__(self): self.net=None
+    def __init__(self):
+        self.net=None
+        self._health_stop = threading.Event(); self._health_sock = None; self._health_thread = None
     def setup_topology(self):
         topo = CombinedTopo()
         self.net = Mininet(topo=topo,
@@ -153,14 +192,72 @@ class CombinedExperiment:
             controller=lambda name: RemoteController(name, ip='127.0.0.1', port=6653),
             link=TCLink, autoSetMacs=True)
         self.net.start()
-        # SDN fail-secure
-        for sw in self.net.switches:
-            sw.cmd(f'ovs-vsctl set-fail-mode {sw.name} secure')
+        # one health thread for all switches (not one ping thread per switch), and
+        # none at all if every switch opted out
+        if any(sw.monitor_enabled for sw in self.net.switches):
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
         info('*** SDN underlay ready\n')
+    def _apply_health(self, bridges, ctrls):
+        # bridges: uuid -> {name, controller}; ctrls: uuid -> {is_connected}
+        connected = {u: c.get('is_connected') for u, c in ctrls.items()}
+        up = {b['name']: any(connected.get(u) for u in _ovs_uuids(b.get('controller', ['set', []]))) for b in bridges.values()}
+        # list, not generator: every switch must be updated even after the first change
+        return any([sw.set_health('healthy' if up.get(sw.name) else 'unknown')
+                    for sw in self.net.switches if sw.monitor_enabled])
+    def _poll_health(self):
+        # fallback: one ovs-vsctl for every bridge's controller refs and every controller's state
+        res = subprocess.run(_HEALTH_QUERY, capture_output=True, text=True)
+        # judge by exit status, not by what (possibly localized) text came back: if ovsdb
+        # can't be read, no switch can be reported healthy
+        if res.returncode != 0: return self._apply_health({}, {})
+        # same for output that isn't the two tables we asked for
+        try:
+            bridges, ctrls = [json.loads(l) for l in res.stdout.splitlines() if l.strip()]
+            bridge_rows = {i: {'name': n, 'controller': c} for i, (n, c) in enumerate(bridges['data'])}
+            ctrl_rows = {u[1]: {'is_connected': c} for u, c in ctrls['data']}
+        except (ValueError, KeyError, TypeError, IndexError):
+            return self._apply_health({}, {})
+        return self._apply_health(bridge_rows, ctrl_rows)
+    def _health_loop(self):
+        # One long-lived JSON-RPC connection to ovsdb-server: the 'monitor' reply carries the
+        # current Bridge/Controller rows and the server then pushes every change (incl.
+        # del-/set-controller), so nothing is forked per update
+        tables = {'Bridge': {}, 'Controller': {}}
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                self._health_sock = sock
+                sock.connect(OVSDB_SOCK); sock.sendall(_HEALTH_MONITOR)
+                # recv() may split a multi-byte character, so decode incrementally
+                dec, utf8, buf = json.JSONDecoder(), codecs.getincrementaldecoder('utf-8')(), ''
+                while not self._health_stop.is_set():
+                    if not select.select([sock], [], [], 1.0)[0]: continue
+                    data = sock.recv(65536)
+                    if not data: break
+                    buf += utf8.decode(data)
+                    while buf:
+                        try: msg, end = dec.raw_decode(buf)
+                        except ValueError: break  # partial message, wait for more
+                        buf = buf[end:].lstrip()
+                        if msg.get('method') == 'echo':  # keepalive, must be answered
+                            sock.sendall(json.dumps({'id': msg['id'], 'result': msg['params'], 'error': None}).encode())
+                            continue
+                        updates = msg['params'][1] if msg.get('method') == 'update' else msg.get('result') or {}
+                        for table, rows in updates.items():
+                            for uuid, change in rows.items():
+                                if 'new' in change: tables[table][uuid] = {**tables[table].get(uuid, {}), **change['new']}
+                                else: tables[table].pop(uuid, None)
+                        self._apply_health(tables['Bridge'], tables['Controller'])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass  # includes undecodable or unexpectedly shaped messages
+        # ovsdb connection lost or unusable: fall back to polling, 1 s right after a change, backing off
+        # to 30 s while nothing changes; stop() sets the event to exit immediately
+        interval = 1.0
+        while not self._health_stop.wait(interval):
+            interval = 1.0 if self._poll_health() else min(interval * 2, 30.0)
     def configure_bgp(self):
         r1 = self.net.get('bgp1'); r2 = self.net.get('bgp2')
-        r1.setup_frr(peers=[{'ip':'10.0.12.2','asn':65002}])
-        r2.setup_frr(peers=[{'ip':'10.0.12.1','asn':65001}])
+        _setup_routers([(r1, [{'ip':'10.0.12.2','asn':65002}]), (r2, [{'ip':'10.0.12.1','asn':65001}])])
         # static routes
         r1.cmd('ip route add 10.0.2.0/24 via 10.0.12.2')
         r2.cmd('ip route add 10.0.1.0/24 via 10.0.12.1')
@@ -168,7 +265,17 @@ class CombinedExperiment:
     def start(self):
         self.setup_topology(); self.configure_bgp()
         CLI(self.net, script=self)
+    def stop_monitor(self):
+        # detach every switch, then wake the health thread (event + socket shutdown both cut
+        # its waits short) and give it a moment to exit before the network goes away
+        for sw in self.net.switches: sw.stop_monitor()
+        self._health_stop.set()
+        if self._health_sock:
+            try: self._health_sock.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+        if self._health_thread: self._health_thread.join(timeout=2)
     def stop(self):
+        self.stop_monitor()
         info('*** Stopping FRR\n')
         for r in ('bgp1','bgp2'):
             self.net.get(r).cmd('killall -9 zebra bgpd || true')
@@ -181,20 +288,21 @@ class CustomCLI(CLI):
         for r in line.split(): self.mn.get(r).cmd('pkill bgpd')
         print('*** BGP router(s) stopped')
     def do_failsdn(self, line):
-        for sw in line.split(): self.mn.get(sw).cmd(f'ovs-vsctl del-controller {sw}')
+        _parallel_cmd(line.split(), lambda sw: ['ovs-vsctl', 'del-controller', sw])
         print('*** SDN control links removed')
     def do_failboth(self, line):
         parts = line.split(); self.do_failbgp(parts[0]); self.do_failsdn(' '.join(parts[1:]))
         print('*** Combined failure')
     def do_recoverbgp(self, line):
-        for r in ('bgp1','bgp2'): self.mn.get(r).setup_frr(peers=[{'ip':'10.0.12.2','asn':65002} if r=='bgp1' else {'ip':'10.0.12.1','asn':65001}])
+        _setup_routers([(self.mn.get('bgp1'), [{'ip':'10.0.12.2','asn':65002}]),
+                        (self.mn.get('bgp2'), [{'ip':'10.0.12.1','asn':65001}])])
         print('*** BGP recovered')
     def do_recoversdn(self, line):
-        for sw in self.mn.switches: sw.cmd(f'ovs-vsctl set-controller {sw.name} tcp:127.0.0.1:6653')
+        _parallel_cmd(self.mn.switches, lambda sw: ['ovs-vsctl', 'set-controller', sw.name, 'tcp:127.0.0.1:6653'])
         print('*** SDN control restored')
     def do_status(self, line):
         print('Switch health:'); [print(f" {sw.name}: {sw.health_state}") for sw in self.mn.switches]
-        print('BGP neighbors:'); [self.mn.get(r).cmd('vtysh -c "show ip bgp summary"') for r in ('bgp1','bgp2')]
+        print('BGP neighbors:'); [print(self.mn.get(r).vtysh('show ip bgp summary')) for r in ('bgp1','bgp2')]
 
 # ---------- Topology Definition ----------
 class CombinedTopo(Topo):
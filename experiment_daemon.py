@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Experiment Daemon
+-----------------
+Keeps a multiprocessing forkserver around with Mininet and the experiment
+module already imported, so repeated experiment runs skip the import cost.
+
+Each run is forked from the warm forkserver and takes over the calling
+terminal (stdin/stdout/stderr are passed over the Unix socket). The child
+is not in the terminal's process group, so the client forwards Ctrl-C
+(SIGINT) and Ctrl-Z (SIGTSTP) to it; the Mininet CLI then reacts to them
+as if the experiment had been started directly.
+
+The control socket lives in /run and is only accessible to root, since
+whoever connects gets a root Mininet CLI.
+
+Usage:
+  sudo python3 experiment_daemon.py serve [module]   # default module: bgp_experiment_copy
+  sudo python3 experiment_daemon.py run
+"""
+
+import os
+import sys
+import signal
+import socket
+import importlib
+import multiprocessing
+import multiprocessing.forkserver
+
+SOCKET_PATH = '/run/bgp-experiment.sock'
+PRELOAD = ['mininet.log', 'mininet.net', 'mininet.node', 'mininet.link', 'mininet.cli']
+
+def _run_experiment(module_name, conn):
+    """Forkserver child: adopt the client's terminal and run one experiment"""
+    _, fds, _, _ = socket.recv_fds(conn, 16, 3)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    # multiprocessing's bootstrap closed the inherited sys.stdin and pointed it at
+    # /dev/null, so rebind the Python-level streams to the client's fds as well
+    sys.stdin = open(0, closefd=False)
+    sys.stdout = open(1, 'w', buffering=1, closefd=False)
+    sys.stderr = open(2, 'w', buffering=1, closefd=False)
+    # The client forwards terminal signals to this pid; Mininet's CLI turns
+    # SIGINT into KeyboardInterrupt and interrupts the running node command
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    conn.sendall(f'pid {os.getpid()}\n'.encode())
+    # main() wraps start_experiment() in try/finally stop_experiment()
+    importlib.import_module(module_name).main()
+    sys.stdout.flush()
+
+def serve(module_name):
+    """Start the forkserver and handle 'run' requests one at a time"""
+    multiprocessing.set_start_method('forkserver')
+    multiprocessing.set_forkserver_preload(PRELOAD + [module_name])
+    multiprocessing.forkserver.ensure_running()
+
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(SOCKET_PATH)
+        os.chmod(SOCKET_PATH, 0o600)
+        server.listen(1)
+        print(f'*** Experiment daemon ready on {SOCKET_PATH} ({module_name})')
+        # Mininet can only run one topology at a time, so runs are serial
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                proc = multiprocessing.Process(target=_run_experiment,
+                                               args=(module_name, conn))
+                proc.start()
+                proc.join()
+                print(f'*** Experiment finished with exit code {proc.exitcode}')
+                try:
+                    conn.sendall(f'exit {proc.exitcode}\n'.encode())
+                except OSError:
+                    pass
+
+def run():
+    """Ask the daemon to run one experiment on this terminal"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(SOCKET_PATH)
+        socket.send_fds(sock, [b'run'], [0, 1, 2])
+        status = 1
+        for line in sock.makefile('r'):
+            key, _, value = line.partition(' ')
+            if key == 'pid':
+                _forward_signals(int(value))
+            elif key == 'exit':
+                status = int(value)
+    sys.exit(status)
+
+def _forward_signals(pid):
+    """Relay Ctrl-C / Ctrl-Z from this terminal to the experiment process"""
+    def forward(sig, _):
+        os.kill(pid, sig)
+        if sig == signal.SIGTSTP:
+            # Stop ourselves too so the shell sees the job as suspended; on fg
+            # (SIGCONT) resume the experiment and re-arm the handler
+            signal.signal(signal.SIGTSTP, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGTSTP)
+            os.kill(pid, signal.SIGCONT)
+            signal.signal(signal.SIGTSTP, forward)
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTSTP, forward)
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == 'serve':
+        serve(sys.argv[2] if len(sys.argv) > 2 else 'bgp_experiment_copy')
+    elif len(sys.argv) == 2 and sys.argv[1] == 'run':
+        run()
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -15,6 +15,7 @@ from ryu.controller.handler import MAIN_DISPATCHER, CONFIG_DISPATCHER, DEAD_DISP
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3
 from ryu.lib.packet import packet, ethernet, ether_types, ipv4
+from ryu.lib import hub
 import networkx as nx
 
 class OrionController(app_manager.RyuApp):
@@ -34,50 +35,70 @@ class OrionController(app_manager.RyuApp):
         for sp in spines:
             for lf in leafs:
                 self.net.add_edge(sp, lf)
+        # 预计算每对 leaf 之间可经过的 spine（leaf–spine–leaf 两跳），
+        # spine 失联时只需过滤，无需在图上重新计算
+        self.paths = {(src, dst): [sp for sp in spines
+                                   if self.net.has_edge(src, sp) and self.net.has_edge(sp, dst)]
+                      for src in leafs for dst in leafs if src != dst}
         # 监测各节点连接状态
         self.alive_spines = set(spines)
-        # 记录 dpid -> name
+        # 记录 dpid -> name（需与拓扑中交换机的 DPID 配置一致）
+        self.dpid_to_name = {1: 'sp1', 2: 'sp2', 3: 'l1', 4: 'l2'}
+        self.spine_dpids = frozenset({1, 2})
         self.datapaths = {}
         self.mac_to_port = {}
+        # spine 抖动时合并短时间内的多次状态变化，只重算一次
+        self._recompute_thread = None
 
     @set_ev_cls(ofp_event.EventOFPStateChange, [MAIN_DISPATCHER, DEAD_DISPATCHER])
     def _state_change_handler(self, ev):
         dp = ev.datapath
         dpid = dp.id
-        name = dp.ofproto.OFPT_HELLO  # placeholder, 实际应通过配置映射
-        # 简化：假设 dpid 1/2 为 sp1/sp2，其它为 leaf
-        if dpid in (1,2):
-            sp_name = f"sp{dpid}"
+        if dpid in self.spine_dpids:
+            sp_name = self.dpid_to_name[dpid]
             if ev.state == MAIN_DISPATCHER:
                 if sp_name not in self.alive_spines:
                     self.alive_spines.add(sp_name)
                     self.logger.info("*** Spine %s reconnected", sp_name)
-                    self._recompute_routes()
+                    self._schedule_recompute()
             elif ev.state == DEAD_DISPATCHER:
                 if sp_name in self.alive_spines:
                     self.alive_spines.remove(sp_name)
                     self.logger.info("*** Spine %s LOST", sp_name)
-                    self._recompute_routes()
+                    self._schedule_recompute()
+
+    def _schedule_recompute(self, delay=0.1):
+        """
+        在 delay 秒后重算路由；窗口内再有事件则取消并重新计时
+        """
+        # Ryu 事件处理都在同一个 eventlet hub 上，无需加锁
+        if self._recompute_thread:
+            hub.kill(self._recompute_thread)
+        self._recompute_thread = hub.spawn_after(delay, self._recompute_routes)
 
     def _recompute_routes(self):
+        # 已开始执行，之后的 _schedule_recompute 不应再 kill 本次重算
+        self._recompute_thread = None
         total = 2
         failed = total - len(self.alive_spines)
         ratio = failed / total
         if ratio < self.capacity_degradation_threshold:
             # Fail-Closed：重新安装绕过失联 spine 的单路径流表
             self.logger.info("=== Fail-Closed (failed=%d) ===", failed)
-            self._install_unicast_via(self.alive_spines)
+            for (src, dst), vias in self.paths.items():
+                live = [sp for sp in vias if sp in self.alive_spines]
+                self._install_unicast_via(src, dst, live)
         else:
             # Fail-Static：不再变动流表
             self.logger.info("=== Fail-Static (failed=%d) ===", failed)
             # nothing
 
-    def _install_unicast_via(self, spines):
+    def _install_unicast_via(self, src, dst, spines):
         """
         简化：演示如何下发流表到 leaf 交换机
         真实场景需获取端口映射并安装流表
         """
-        self.logger.info("Installing new path via %s", list(spines))
+        self.logger.info("Installing new path %s -> %s via %s", src, dst, spines)
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -87,12 +108,17 @@ class OrionController(app_manager.RyuApp):
         dp = ev.msg.datapath
         ofp = dp.ofproto
         parser = dp.ofproto_parser
-        # 清空表
-        mod = parser.OFPFlowMod(datapath=dp, command=ofp.OFPFC_DELETE)
-        dp.send_msg(mod)
+        # 清空表 + 默认 flood 放进同一个 bundle，原子提交（OF1.3 使用 ONF bundle 扩展）
+        bundle_id = dp.id & 0xffffffff
+        flags = ofp.ONF_BF_ATOMIC | ofp.ONF_BF_ORDERED
+        mod = parser.OFPFlowMod(datapath=dp, command=ofp.OFPFC_DELETE, table_id=ofp.OFPTT_ALL,
+                                out_port=ofp.OFPP_ANY, out_group=ofp.OFPG_ANY)
         # table=0, priority=0: flood
         match = parser.OFPMatch()
         actions = [parser.OFPActionOutput(ofp.OFPP_FLOOD)]
         inst = [parser.OFPInstructionActions(ofp.OFPIT_APPLY_ACTIONS, actions)]
         fm = parser.OFPFlowMod(datapath=dp, priority=0, match=match, instructions=inst)
-        dp.send_msg(fm)
\ No newline at end of file
+        dp.send_msg(parser.ONFBundleCtrlMsg(dp, bundle_id, ofp.ONF_BCT_OPEN_REQUEST, flags, []))
+        for m in (mod, fm):
+            dp.send_msg(parser.ONFBundleAddMsg(dp, bundle_id, flags, m, []))
+        dp.send_msg(parser.ONFBundleCtrlMsg(dp, bundle_id, ofp.ONF_BCT_COMMIT_REQUEST, flags, []))
@@ -55,6 +55,7 @@ if __name__ == '__main__':
     topo = OrionTopo()
     net = Mininet(
         topo=topo,
+        # OVSSwitch 默认即为 Fail-Secure 模式（控制器失联时保留流表），创建网桥时设置
         switch=OVSSwitch,
         controller=lambda name: RemoteController(name, ip='127.0.0.1', port=6653),
         link=TCLink,
@@ -62,10 +63,6 @@ if __name__ == '__main__':
     )
     net.start()
 
-    info('*** 设置所有交换机为 Fail-Secure 模式 (控制器失联时保留流表)\n')
-    for sw in net.switches:
-        sw.cmd(f'ovs-vsctl set-fail-mode {sw.name} secure')
-
     info('*** 拓扑就绪，进入 CLI ***\n')
     CLI(net)
     net.stop()
\ No newline at end of file